@@ -8,7 +8,7 @@ from parmed.constants import (NATOM, NTYPES, NBONH, NTHETH, NPHIH,
             NEXT, NRES, NBONA, NTHETA, NPHIA, NUMBND, NUMANG, NPTRA, NATYP,
             NPHB, IFBOX, IFCAP, AMBER_ELECTROSTATIC, CHARMM_ELECTROSTATIC)
 from parmed.exceptions import AmberError
-from parmed.formats.registry import FileFormatType
+from parmed.formats.registry import FileFormatType, header_lines
 from parmed.utils.io import genopen
 from parmed.utils.six import string_types, add_metaclass
 from parmed.utils.six.moves import range
@@ -309,10 +309,13 @@ class AmberFormat(object):
     name : str
         The file name of the originally parsed file (set to the fname parameter)
     """
+    priority = 10
+    extensions = ('.prmtop', '.parm7')
+
     #===================================================
 
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """
         Identifies the file type as either Amber-format file (like prmtop) or an
         old-style topology file.
@@ -321,20 +324,24 @@ class AmberFormat(object):
         ----------
         filename : str
             Name of the file to check format for
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is an Amber-style format, False otherwise
         """
-        if isinstance(filename, string_types):
-            with closing(genopen(filename, 'r')) as f:
-                lines = [f.readline() for i in range(5)]
-        elif (hasattr(filename, 'readline') and hasattr(filename, 'seek')
-              and hasattr(filename, 'tell')):
-            cur = filename.tell()
-            lines = [filename.readline() for i in range(5)]
-            filename.seek(cur)
+        lines = header_lines(header, 5)
+        if lines is None:
+            if isinstance(filename, string_types):
+                with closing(genopen(filename, 'r')) as f:
+                    lines = [f.readline() for i in range(5)]
+            elif (hasattr(filename, 'readline') and hasattr(filename, 'seek')
+                  and hasattr(filename, 'tell')):
+                cur = filename.tell()
+                lines = [filename.readline() for i in range(5)]
+                filename.seek(cur)
 
         if lines[0].startswith('%VERSION'):
             return True
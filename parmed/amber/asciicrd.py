@@ -10,7 +10,7 @@ from __future__ import division, print_function, absolute_import
 
 from math import ceil
 import numpy as np
-from parmed.formats.registry import FileFormatType
+from parmed.formats.registry import FileFormatType, header_lines
 from parmed.utils.io import genopen
 from parmed.utils.six import add_metaclass
 from parmed.utils.six.moves import range
@@ -130,29 +130,35 @@ class AmberAsciiRestart(_AmberAsciiCoordinateFile):
         time : float, optional
             The time to write to the restart file in ps. Default is 0.
     """
+    extensions = ('.inpcrd', '.rst7', '.restrt')
+
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Identifies the file type as an Amber restart/inpcrd file
 
         Parameters
         ----------
         filename : str
             Name of the file to check format for
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is an Amber restart/inpcrd file. False otherwise
         """
-        if isinstance(filename, string_types):
-            f = genopen(filename, 'r')
-            lines = [f.readline() for i in range(5)]
-            f.close()
-        elif (hasattr(filename, 'readline') and hasattr(filename, 'seek')
-              and hasattr(filename, 'tell')):
-            cur = filename.tell()
-            lines = [filename.readline() for i in range(5)]
-            filename.seek(cur)
+        lines = header_lines(header, 5)
+        if lines is None:
+            if isinstance(filename, string_types):
+                f = genopen(filename, 'r')
+                lines = [f.readline() for i in range(5)]
+                f.close()
+            elif (hasattr(filename, 'readline') and hasattr(filename, 'seek')
+                  and hasattr(filename, 'tell')):
+                cur = filename.tell()
+                lines = [filename.readline() for i in range(5)]
+                filename.seek(cur)
         # Look for natom
         words = lines[1].split()
         if len(words) > 2 or len(words) < 1:
@@ -464,27 +470,32 @@ class AmberMdcrd(_AmberAsciiCoordinateFile):
     like C or C++). For large trajectories, this may be significant.
     """
     extra_args = ('natom', 'hasbox')
+    extensions = ('.mdcrd',)
 
     CRDS_PER_LINE = 10
     DEFAULT_TITLE = 'trajectory created by ParmEd'
 
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Identifies the file type as an Amber mdcrd file
 
         Parameters
         ----------
         filename : str
             Name of the file to check format for
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is an Amber mdcrd file. False otherwise
         """
-        f = genopen(filename, 'r')
-        lines = [f.readline() for i in range(5)]
-        f.close()
+        lines = header_lines(header, 5)
+        if lines is None:
+            f = genopen(filename, 'r')
+            lines = [f.readline() for i in range(5)]
+            f.close()
         # Next 4 lines, make sure we have %8.3f format
         try:
             for i in range(4):
@@ -32,6 +32,9 @@ import warnings
 class NetCDFRestart(object):
     """ Class to read or write NetCDF restart files """
 
+    magic = (b'CDF\x01', b'CDF\x02')
+    extensions = ('.ncrst',)
+
     @staticmethod
     def id_format(filename):
         """ Identifies the file type as an Amber NetCDF restart file
@@ -363,6 +366,9 @@ class NetCDFTraj(object):
     the default constructor
     """
 
+    magic = (b'CDF\x01', b'CDF\x02')
+    extensions = ('.nc', '.ncdf')
+
     @staticmethod
     def id_format(filename):
         """ Identifies the file type as an Amber NetCDF trajectory file
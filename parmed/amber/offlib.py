@@ -10,7 +10,7 @@ import numpy as np
 from ..topologyobjects import Atom
 from ..constants import RAD_TO_DEG
 from ..exceptions import AmberWarning
-from ..formats.registry import FileFormatType
+from ..formats.registry import FileFormatType, header_lines
 from ..modeller.residue import ResidueTemplate, ResidueTemplateContainer
 from ..modeller.residue import PROTEIN, NUCLEIC, SOLVENT, UNKNOWN
 from .. import periodic_table as pt
@@ -28,6 +28,9 @@ class AmberOFFLibrary(object):
     """
     #===================================================
 
+    magic = (b'!!index',)
+    extensions = ('.lib', '.off')
+
     # Useful regexes
     _headerre = re.compile(r'!!index *array *str')
     _resre = re.compile(r'\s*"(\S*?)"\s*$')
@@ -63,23 +66,28 @@ class AmberOFFLibrary(object):
     #===================================================
 
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Sees if an open file is an OFF library file.
 
         Parameters
         ----------
         filename : str
             The name of the file to see if it is an OFF file format
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is recognized as OFF, False otherwise
         """
-        with closing(genopen(filename, 'r')) as f:
-            if AmberOFFLibrary._headerre.match(f.readline()):
-                return True
-            return False
+        lines = header_lines(header)
+        if lines is None:
+            with closing(genopen(filename, 'r')) as f:
+                lines = [f.readline()]
+        if AmberOFFLibrary._headerre.match(lines[0]):
+            return True
+        return False
 
     #===================================================
 
@@ -97,6 +97,7 @@ class AmberParameterSet(ParameterSet):
     --------
     :class:`parmed.parameters.ParameterSet`
     """
+    extensions = ('.frcmod',)
 
     #===================================================
 
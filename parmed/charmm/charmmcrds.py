@@ -12,7 +12,7 @@ from __future__ import print_function, division, absolute_import
 from contextlib import closing
 import numpy as np
 from ..utils import io
-from ..formats.registry import FileFormatType
+from ..formats.registry import FileFormatType, header_lines
 from ..exceptions import CharmmError
 from .. import unit as u
 from ..utils.six import add_metaclass, string_types
@@ -227,23 +227,29 @@ class CharmmRstFile(object):
         attached.  Has the format [ [x1, y1, z1], [x2, y2, z2], ... ]
     """
 
+    magic = (b'REST',)
+
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Identifies the file type as a CHARMM restart file
 
         Parameters
         ----------
         filename : str
             Name of the file to check format for
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is a CHARMM restart file
         """
-        with closing(io.genopen(filename)) as f:
-            line = f.readline()
-        return line.startswith('REST')
+        lines = header_lines(header)
+        if lines is None:
+            with closing(io.genopen(filename)) as f:
+                lines = [f.readline()]
+        return lines[0].startswith('REST')
 
     def __init__(self, fname):
         self.header = []
@@ -20,6 +20,9 @@ import warnings
 class Mol2File(object):
     """ Class to read and write TRIPOS Mol2 files """
 
+    magic = (b'@<TRIPOS>', b'#')
+    extensions = ('.mol2', '.mol3')
+
     BOND_ORDER_MAP = dict(ar=1.5, am=1.25)
     REVERSE_BOND_ORDER_MAP = {1.25 : 'am', 1.5 : 'ar'}
 
@@ -105,6 +105,9 @@ def _number_truncated_to_n_digits(num, digits):
 @add_metaclass(FileFormatType)
 class PDBFile(object):
     """ Standard PDB file format parser and writer """
+    priority = 10
+    extensions = ('.pdb', '.ent')
+
     #===================================================
 
     AtomLookupKey = namedtuple(
@@ -1031,6 +1034,9 @@ class PDBFile(object):
 @add_metaclass(FileFormatType)
 class CIFFile(object):
     """ Standard PDBx/mmCIF file format parser and writer """
+    magic = (b'data_', b'#')
+    extensions = ('.cif', '.mmcif')
+
     #===================================================
 
     @staticmethod
@@ -19,6 +19,8 @@ import warnings
 @add_metaclass(FileFormatType)
 class PQRFile(object):
     """ Standard PDB file format parser and writer """
+    extensions = ('.pqr',)
+
     #===================================================
 
     @staticmethod
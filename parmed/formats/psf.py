@@ -5,7 +5,7 @@ files
 from parmed.charmm import CharmmPsfFile
 # TODO -- move this functionality to a more centralized location
 from parmed.charmm.psf import set_molecules
-from parmed.formats.registry import FileFormatType
+from parmed.formats.registry import FileFormatType, header_lines
 from parmed.utils.io import genopen
 from parmed.utils.six import add_metaclass, string_types
 from parmed.utils.six.moves import range
@@ -19,26 +19,33 @@ class PSFFile(object):
     directly, use :class:`parmed.charmm.CharmmPsfFile` or the
     :func:`parmed.formats.load_file` function instead.
     """
+    magic = (b'PSF',)
+    extensions = ('.psf',)
+
     #===================================================
 
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Identifies the file type as a CHARMM PSF file
 
         Parameters
         ----------
         filename : str
             Name of the file to check format for
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
         is_fmt : bool
             True if it is a CHARMM or Xplor-style PSF file
         """
-        f = genopen(filename, 'r')
-        line = f.readline()
-        f.close()
-        return line.strip().startswith('PSF')
+        lines = header_lines(header)
+        if lines is None:
+            f = genopen(filename, 'r')
+            lines = [f.readline()]
+            f.close()
+        return lines[0].strip().startswith('PSF')
 
     #===================================================
 
@@ -9,22 +9,99 @@ The following static class functions will trigger special behavior:
       if the file is that format or False if not.
 
     - parse(file) : Takes a file name or file-like object, parse through the
-      whole thing and return it. If this method is not found, the constructor is
-      called directly.
+      whole thing and return it. If this method is not found, open_old or open
+      is used instead, and if neither is found the constructor is called
+      directly. The chosen callable is stored in PARSER_DISPATCH.
+
+The following optional class attributes are also recognized:
+
+    - magic : A tuple of byte strings, one of which the file must begin with
+      (ignoring leading whitespace) in order to be that format. Classes that
+      declare ``magic`` are only asked to ``id_format`` files whose header
+      matches, which saves opening the file for every registered format.
+
+    - id_format may accept an optional ``header`` keyword, in which case it is
+      passed the first few kB (64 kB for compressed files) of the decompressed
+      file as bytes so it does not have to open and inflate the file again. Use
+      header_lines to read lines from it. id_format must still work when
+      ``header`` is not given.
+
+    - priority : An integer (default 100) controlling the order in which formats
+      are asked to identify a file; lower values are tried first. Commonly used
+      formats should have a low priority so most files are identified by one of
+      the first few id_format calls.
+
+    - extensions : A tuple of lower-case file extensions (like ``'.pdb'``)
+      conventionally used for the format. Files with one of these extensions
+      (ignoring a trailing .gz or .bz2) are checked with that format's
+      id_format before any other. If several formats claim an extension, the
+      one with the lowest priority wins.
 
 Note, id_format must be IMPLEMENTED for each class added to the registry, not
 simply inherited from a base class (unless that base class is not a metaclass of
 FileFormatType)
 """
 from __future__ import division, print_function, absolute_import
+import atexit
+from collections import OrderedDict
 from contextlib import closing
-from parmed.utils.io import genopen
-from parmed.utils.six import iteritems
+from parmed.constants import DEFAULT_ENCODING
+from parmed.utils.six.moves.urllib.request import urlopen
+from parmed.utils.six.moves.urllib.error import HTTPError, URLError
 from parmed.exceptions import FormatNotFound
 import os
+import shutil
+import tempfile
+import threading
 
 PARSER_REGISTRY = dict()
 PARSER_ARGUMENTS = dict()
+PARSER_DISPATCH = dict()
+
+# Serializes changes to the registries below when parsers are registered
+_REGISTRY_LOCK = threading.RLock()
+
+# The (name, class, id_format) of every registered parser in priority order
+_ID_FORMAT_CHAIN = []
+_DEFAULT_PRIORITY = 100
+
+# Maps magic prefixes to the parsers (as _ID_FORMAT_CHAIN entries) that declare
+# them, and holds the names of the parsers that declare magic at all or accept a
+# header. 4-byte magic numbers (the common size of binary file signatures) are
+# kept apart in _MAGIC4 so they can be matched with a single hashed lookup;
+# other prefixes are listed longest first in _MAGIC_PREFIXES
+_MAGIC4 = dict()
+_MAGIC_REGISTRY = dict()
+_MAGIC_PREFIXES = []
+_MAGIC_PARSERS = set()
+_HEADER_PARSERS = set()
+
+# Maps (lower-case) file extensions to the parser that is tried first for them
+_EXT_DISPATCH = dict()
+
+# File names starting with any of these are loaded from a remote location
+_URL_PREFIXES = ('http://', 'https://', 'ftp://')
+
+# Number of bytes read from the start of a file to identify its format
+_HEADER_SIZE = 4096
+
+# Compressed files are more expensive to reopen (they have to be inflated from
+# the start every time), so more of them is read up front to give id_format
+# functions that accept a header everything they need
+_COMPRESSED_HEADER_SIZE = 65536
+
+# Maps (real path, mtime, size) of recently identified local files to the name
+# of their parser, in least- to most-recently used order
+_FORMAT_CACHE = OrderedDict()
+_FORMAT_CACHE_SIZE = 1024
+_FORMAT_CACHE_LOCK = threading.Lock()
+
+# Maps functions to the set of their named arguments
+_ARG_CACHE = dict()
+
+# Keywords that load_file always accepts, but only passes on to the parsers that
+# take them
+_PASSTHROUGH = ('structure', 'natom', 'hasbox', 'skip_bonds')
 
 class FileFormatType(type):
     """
@@ -43,15 +120,44 @@ class FileFormatType(type):
         The list of options and attributes currently present in the class
     """
     def __init__(cls, name, bases, dct):
-        global PARSER_REGISTRY, _CLASS_REGISTRY
-        if name in PARSER_REGISTRY:
-            raise ValueError('Duplicate name %s in parser registry' % name)
-        if 'id_format' in dct:
-            PARSER_REGISTRY[name] = cls
-            if 'extra_args' in dct:
-                PARSER_ARGUMENTS[name] = dct['extra_args']
-            else:
-                PARSER_ARGUMENTS[name] = ()
+        global _ID_FORMAT_CHAIN, _MAGIC_PREFIXES
+        with _REGISTRY_LOCK:
+            if name in PARSER_REGISTRY:
+                raise ValueError('Duplicate name %s in parser registry' % name)
+            if 'id_format' in dct:
+                PARSER_REGISTRY[name] = cls
+                PARSER_ARGUMENTS[name] = frozenset(dct.get('extra_args', ()))
+                # The parser is the first of parse, open_old, and open that is
+                # defined, falling back to the constructor
+                for attr in ('parse', 'open_old', 'open'):
+                    if hasattr(cls, attr):
+                        PARSER_DISPATCH[name] = getattr(cls, attr)
+                        break
+                else:
+                    PARSER_DISPATCH[name] = cls
+                if _accepts_argument(cls.id_format, 'header'):
+                    _HEADER_PARSERS.add(name)
+                # The lists load_file iterates over are replaced rather than
+                # modified, so concurrent calls never see them half-updated
+                entry = (name, cls, cls.id_format)
+                if dct.get('magic') is not None:
+                    _MAGIC_PARSERS.add(name)
+                    for magic in dct['magic']:
+                        if len(magic) == 4:
+                            table = _MAGIC4
+                        else:
+                            table = _MAGIC_REGISTRY
+                        table[magic] = sorted(table.get(magic, []) + [entry],
+                                              key=_chain_priority)
+                    _MAGIC_PREFIXES = sorted(_MAGIC_REGISTRY, key=len,
+                                             reverse=True)
+                for ext in dct.get('extensions', ()):
+                    other = _EXT_DISPATCH.get(ext)
+                    if (other is None or
+                            _chain_priority(entry) < _chain_priority(other)):
+                        _EXT_DISPATCH[ext] = entry
+                _ID_FORMAT_CHAIN = sorted(_ID_FORMAT_CHAIN + [entry],
+                                          key=_chain_priority)
         super(FileFormatType, cls).__init__(name, bases, dct)
 
 def load_file(filename, *args, **kwargs):
@@ -156,65 +262,249 @@ def load_file(filename, *args, **kwargs):
         If the identified format requires additional arguments that are not
         provided as keyword arguments in addition to the file name
     """
-    global PARSER_REGISTRY, PARSER_ARGUMENTS
-
-    # Check that the file actually exists and that we can read it
-    if filename.startswith('http://') or filename.startswith('https://')\
-            or filename.startswith('ftp://'):
-        # This raises IOError if it does not exist; assert silences linters
-        with closing(genopen(filename)) as f:
-            assert f
-    elif not os.path.exists(filename):
+    if filename.startswith(_URL_PREFIXES):
+        # Fetch remote files once into a temporary file, rather than once for
+        # every format asked to identify it and once more to parse it. The
+        # temporary file names are unique, so their formats are not cached
+        local = _download(filename)
+        try:
+            obj = _load_local_file(local, None, args, kwargs)
+        finally:
+            _remove_download(local)
+        if getattr(obj, 'name', None) == local:
+            obj.name = filename
+        return obj
+
+    # Check that the file actually exists and that we can read it. The stat
+    # result doubles as the key for the format cache
+    try:
+        st = os.stat(filename)
+    except OSError:
         raise IOError('%s does not exist' % filename)
-    elif not os.access(filename, os.R_OK):
+    if not os.access(filename, os.R_OK):
         raise IOError('%s does not have read permissions set' % filename)
+    cache_key = (os.path.realpath(filename),
+                 getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+    return _load_local_file(filename, cache_key, args, kwargs)
 
-    for name, cls in iteritems(PARSER_REGISTRY):
-        if not hasattr(cls, 'id_format'):
-            continue
+def _load_local_file(filename, cache_key, args, kwargs):
+    """
+    Identifies the format of a local file and parses it. The identified format
+    is cached under cache_key, unless it is None
+    """
+    with _FORMAT_CACHE_LOCK:
+        name = _FORMAT_CACHE.pop(cache_key, None)
+        if name is not None:
+            # Re-insert as the most recently used entry
+            _FORMAT_CACHE[cache_key] = name
+    if name is None:
+        # Identification does I/O, so do not hold the lock while doing it
+        name = _identify_format(filename, _read_header(filename))
+        if cache_key is not None:
+            with _FORMAT_CACHE_LOCK:
+                _FORMAT_CACHE[cache_key] = name
+                if len(_FORMAT_CACHE) > _FORMAT_CACHE_SIZE:
+                    _FORMAT_CACHE.popitem(last=False)
+
+    # We found a file format that is compatible. Parse it!
+    missing = PARSER_ARGUMENTS[name].difference(kwargs)
+    if missing:
+        raise TypeError('%s constructor expects %s keyword argument(s)' %
+                        (name, ', '.join(sorted(missing))))
+    dispatch = PARSER_DISPATCH[name]
+    _filter_kwargs(dispatch, kwargs)
+    return dispatch(filename, *args, **kwargs)
+
+def header_lines(header, nlines=1):
+    """
+    Decodes the first lines of a file header passed to id_format
+
+    Parameters
+    ----------
+    header : bytes or None
+        The first bytes of the file
+    nlines : int, optional
+        The number of lines to extract. Default is 1
+
+    Returns
+    -------
+    lines : list of str or None
+        The first ``nlines`` lines, with line endings normalized to ``\\n`` (as
+        readline would return them), or None if ``header`` is None or does not
+        contain that many complete lines
+    """
+    if header is None:
+        return None
+    lines = header.splitlines(True)
+    if len(lines) < nlines:
+        return None
+    if len(lines) == nlines and not lines[-1].endswith(b'\n'):
+        # The last line is either truncated or its \r\n may be split
+        return None
+    return [line.rstrip(b'\r\n').decode(DEFAULT_ENCODING) + '\n'
+            for line in lines[:nlines]]
+
+def _download(url):
+    """
+    Copies a remote file into a local temporary file and returns its name. The
+    file extension is kept, so compressed files are still detected as such
+    """
+    try:
+        remote = urlopen(url)
+    except (HTTPError, URLError) as e:
+        raise IOError('Could not open %s: %s' % (url, e))
+    root, ext = os.path.splitext(url.split('?', 1)[0].rsplit('/', 1)[-1])
+    if ext in ('.gz', '.bz2'):
+        ext = os.path.splitext(root)[1] + ext
+    with closing(remote):
+        with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as local:
+            shutil.copyfileobj(remote, local)
+    return local.name
+
+def _remove_download(fname):
+    """
+    Deletes a downloaded temporary file. Some platforms do not allow deleting
+    files that are still open (e.g., by a parser that reads them lazily), in
+    which case it is deleted when the interpreter exits
+    """
+    try:
+        os.remove(fname)
+    except OSError:
+        atexit.register(_remove_quietly, fname)
+
+def _remove_quietly(fname):
+    try:
+        os.remove(fname)
+    except OSError:
+        pass
+
+def _read_header(filename):
+    """
+    Reads the first _HEADER_SIZE bytes of a file, or the first
+    _COMPRESSED_HEADER_SIZE decompressed bytes of a compressed file
+    """
+    if filename.endswith('.gz'):
+        import gzip
+        f = gzip.open(filename, 'rb')
+    elif filename.endswith('.bz2'):
+        import bz2
+        f = bz2.BZ2File(filename, 'rb')
+    else:
+        return _sniff(filename, _HEADER_SIZE)
+    with closing(f):
+        return f.read(_COMPRESSED_HEADER_SIZE)
+
+def _sniff(filename, nbytes):
+    """
+    Reads the first nbytes of an uncompressed file with raw system calls,
+    avoiding the buffers a Python file object would allocate
+    """
+    fd = os.open(filename, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(fd, 0, nbytes, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass # Only a hint, and not supported for every file type
+        return os.read(fd, nbytes)
+    finally:
+        os.close(fd)
+
+def _identify_format(filename, header):
+    """
+    Returns the name of the first registered parser that identifies filename,
+    passing header on to the id_format functions that accept it
+
+    Raises
+    ------
+    parmed.exceptions.FormatNotFound
+        If no registered parser identifies the file
+    """
+    for name, cls, id_format in _id_candidates(filename, header):
         try:
-            if cls.id_format(filename):
-                break
+            if header is not None and name in _HEADER_PARSERS:
+                if id_format(filename, header=header):
+                    return name
+            elif id_format(filename):
+                return name
         except UnicodeDecodeError:
             continue
-    else:
-        # We found no file format
-        raise FormatNotFound('Could not identify file format')
+    # We found no file format
+    raise FormatNotFound('Could not identify file format')
 
-    # We found a file format that is compatible. Parse it!
-    other_args = PARSER_ARGUMENTS[name]
-    for arg in other_args:
-        if not arg in kwargs:
-            raise TypeError('%s constructor expects %s keyword argument' %
-                            name, arg)
-    # Pass on the following keywords IFF the target function accepts a target
-    # keyword. Otherwise, get rid of it: structure, natom, hasbox, skip_bonds
-    if hasattr(cls, 'parse'):
-        _prune_argument(cls.parse, kwargs, 'structure')
-        _prune_argument(cls.parse, kwargs, 'natom')
-        _prune_argument(cls.parse, kwargs, 'hasbox')
-        _prune_argument(cls.parse, kwargs, 'skip_bonds')
-        return cls.parse(filename, *args, **kwargs)
-    elif hasattr(cls, 'open_old'):
-        _prune_argument(cls.open_old, kwargs, 'structure')
-        _prune_argument(cls.open_old, kwargs, 'natom')
-        _prune_argument(cls.open_old, kwargs, 'hasbox')
-        _prune_argument(cls.open_old, kwargs, 'skip_bonds')
-        return cls.open_old(filename, *args, **kwargs)
-    elif hasattr(cls, 'open'):
-        _prune_argument(cls.open, kwargs, 'structure')
-        _prune_argument(cls.open, kwargs, 'natom')
-        _prune_argument(cls.open, kwargs, 'hasbox')
-        _prune_argument(cls.open, kwargs, 'skip_bonds')
-        return cls.open(filename, *args, **kwargs)
-    _prune_argument(cls.__init__, kwargs, 'structure')
-    _prune_argument(cls.__init__, kwargs, 'natom')
-    _prune_argument(cls.__init__, kwargs, 'hasbox')
-    _prune_argument(cls.__init__, kwargs, 'skip_bonds')
-    return cls(filename, *args, **kwargs)
-
-def _prune_argument(func, kwargs, keyword):
-    if keyword in kwargs:
-        if (keyword not in
-                func.__code__.co_varnames[:func.__code__.co_argcount]):
+def _chain_priority(entry):
+    return getattr(entry[1], 'priority', _DEFAULT_PRIORITY)
+
+def _id_candidates(filename, header):
+    """
+    Yields the (name, class, id_format) of the registered parsers that may be
+    able to identify a file, in the order they should be tried. The parser
+    registered for the file's extension (if any) is tried first, followed by the
+    candidates for its header
+    """
+    first = _EXT_DISPATCH.get(_file_extension(filename))
+    if first is not None:
+        yield first
+    for entry in _header_candidates(header):
+        if entry is not first:
+            yield entry
+
+def _header_candidates(header):
+    """
+    Yields the (name, class, id_format) of the registered parsers that may be
+    able to identify a file with the given header, in the order they should be
+    tried. Parsers whose magic matches the header come first (4-byte magic
+    numbers, then other prefixes longest first), followed by all parsers that do
+    not declare any magic in priority order. If header is None, every parser is
+    a candidate.
+    """
+    if header is None:
+        for entry in _ID_FORMAT_CHAIN:
+            yield entry
+        return
+    header = header.lstrip()
+    for entry in _MAGIC4.get(header[:4], ()):
+        yield entry
+    for magic in _MAGIC_PREFIXES:
+        if header.startswith(magic):
+            for entry in _MAGIC_REGISTRY[magic]:
+                yield entry
+    for entry in _ID_FORMAT_CHAIN:
+        if entry[0] not in _MAGIC_PARSERS:
+            yield entry
+
+def _file_extension(filename):
+    """ Returns the lower-case extension of filename, ignoring compression """
+    if filename.endswith('.gz'):
+        filename = filename[:-3]
+    elif filename.endswith('.bz2'):
+        filename = filename[:-4]
+    return os.path.splitext(filename)[1].lower()
+
+def _accepted_arguments(func):
+    """ Returns the (memoized) set of named arguments that func accepts """
+    try:
+        return _ARG_CACHE[func]
+    except KeyError:
+        # Classes are called through their constructor
+        if isinstance(func, type):
+            code = func.__init__.__code__
+        else:
+            code = func.__code__
+        argnames = frozenset(code.co_varnames[:code.co_argcount])
+        _ARG_CACHE[func] = argnames
+        return argnames
+
+def _accepts_argument(func, keyword):
+    """ Determines whether func takes keyword as a named argument """
+    return keyword in _accepted_arguments(func)
+
+def _filter_kwargs(func, kwargs):
+    """
+    Pass on the load_file keywords in _PASSTHROUGH IFF the target function
+    accepts them. Otherwise, get rid of them
+    """
+    accepted = _accepted_arguments(func)
+    for keyword in _PASSTHROUGH:
+        if keyword in kwargs and keyword not in accepted:
             kwargs.pop(keyword)
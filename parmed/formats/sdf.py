@@ -12,6 +12,7 @@ from parmed import rdkit
 @add_metaclass(FileFormatType)
 class SDFFile(object):
     """ Class to read SDF file """
+    extensions = ('.sdf',)
 
     @staticmethod
     def id_format(filename):
@@ -7,7 +7,7 @@ from __future__ import print_function, division, absolute_import
 from contextlib import closing
 from parmed.constants import TINY
 from parmed.exceptions import GromacsError
-from parmed.formats.registry import FileFormatType
+from parmed.formats.registry import FileFormatType, header_lines
 from parmed.geometry import (box_vectors_to_lengths_and_angles,
                              box_lengths_and_angles_to_vectors,
                              reduce_box_vectors)
@@ -71,16 +71,20 @@ class _AtomLineParser(object):
 @add_metaclass(FileFormatType)
 class GromacsGroFile(object):
     """ Parses and writes Gromacs GRO files """
+    extensions = ('.gro',)
+
     #===================================================
 
     @staticmethod
-    def id_format(filename):
+    def id_format(filename, header=None):
         """ Identifies the file as a GROMACS GRO file
 
         Parameters
         ----------
         filename : str
             Name of the file to check if it is a Gromacs GRO file
+        header : bytes, optional
+            The first bytes of the file, if they have already been read
 
         Returns
         -------
@@ -88,35 +92,37 @@ class GromacsGroFile(object):
             If it is identified as a Gromacs GRO file, return True. False
             otherwise
         """
-        with closing(genopen(filename)) as f:
-            f.readline() # Title line
-            try:
-                int(f.readline().strip()) # number of atoms
-            except ValueError:
-                return False
-            line = f.readline()
-            try:
-                int(line[:5])
-                if not line[5:10].strip(): return False
-                if not line[10:15].strip(): return False
-                int(line[15:20])
-                pdeci = [i for i, x in enumerate(line) if x == '.']
-                ndeci = pdeci[1] - pdeci[0] - 5
-                for i in range(1, 4):
+        lines = header_lines(header, 3)
+        if lines is None:
+            with closing(genopen(filename)) as f:
+                lines = [f.readline() for i in range(3)]
+        try:
+            int(lines[1].strip()) # number of atoms
+        except ValueError:
+            return False
+        line = lines[2]
+        try:
+            int(line[:5])
+            if not line[5:10].strip(): return False
+            if not line[10:15].strip(): return False
+            int(line[15:20])
+            pdeci = [i for i, x in enumerate(line) if x == '.']
+            ndeci = pdeci[1] - pdeci[0] - 5
+            for i in range(1, 4):
+                wbeg = (pdeci[0]-4)+(5+ndeci)*(i-1)
+                wend = (pdeci[0]-4)+(5+ndeci)*i
+                float(line[wbeg:wend])
+            i = 4
+            wbeg = (pdeci[0]-4)+(5+ndeci)*(i-1)
+            wend = (pdeci[0]-4)+(5+ndeci)*i
+            if line[wbeg:wend].strip():
+                for i in range(4, 7):
                     wbeg = (pdeci[0]-4)+(5+ndeci)*(i-1)
                     wend = (pdeci[0]-4)+(5+ndeci)*i
                     float(line[wbeg:wend])
-                i = 4
-                wbeg = (pdeci[0]-4)+(5+ndeci)*(i-1)
-                wend = (pdeci[0]-4)+(5+ndeci)*i
-                if line[wbeg:wend].strip():
-                    for i in range(4, 7):
-                        wbeg = (pdeci[0]-4)+(5+ndeci)*(i-1)
-                        wend = (pdeci[0]-4)+(5+ndeci)*i
-                        float(line[wbeg:wend])
-            except ValueError:
-                return False
-            return True
+        except ValueError:
+            return False
+        return True
 
     #===================================================
 
@@ -23,6 +23,8 @@ class XmlFile(object):
     Wrapper for parsing OpenMM-serialized objects. Supports serialized State,
     System, Integrator, and ForceField objects.
     """
+    magic = (b'<',)
+    extensions = ('.xml',)
 
     @staticmethod
     def id_format(filename):
@@ -51,6 +51,7 @@ class XyzFile(Structure):
         Name of the file containing the residue (and chain) sequence. Default is
         None (so every atom will be part of the same residue)
     """
+    extensions = ('.xyz',)
 
     @staticmethod
     def _check_atom_record(words):
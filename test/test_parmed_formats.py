@@ -2255,6 +2255,133 @@ class TestRegistry(FileIOTestCase):
         os.chmod(fn, int('311', 8))
         self.assertRaises(IOError, lambda: formats.load_file(fn))
 
+    def test_missing_extra_args(self):
+        """ Tests the error for formats missing required keyword arguments """
+        fn = get_fn('tz2.truncoct.crd')
+        with self.assertRaises(TypeError) as cm:
+            formats.load_file(fn, natom=5827)
+        self.assertEqual(str(cm.exception), 'AmberMdcrd constructor expects '
+                         'hasbox keyword argument(s)')
+        with self.assertRaises(TypeError) as cm:
+            formats.load_file(fn)
+        self.assertIn('hasbox, natom keyword', str(cm.exception))
+
+    def test_magic_prefilter(self):
+        """ Tests that formats declaring magic are only probed on a match """
+        registry = formats.registry
+        def candidates_for(header):
+            return [entry[0] for entry in registry._header_candidates(header)]
+        candidates = candidates_for(b'  PSF EXT\n')
+        self.assertEqual(candidates[0], 'PSFFile')
+        self.assertNotIn('NetCDFTraj', candidates)
+        self.assertNotIn('Mol2File', candidates)
+        # Binary signatures are looked up directly
+        self.assertEqual(set(e[0] for e in registry._MAGIC4[b'CDF\x02']),
+                         {'NetCDFTraj', 'NetCDFRestart'})
+        candidates = candidates_for(b'CDF\x02\x00\x00')
+        self.assertIn('NetCDFTraj', candidates[:2])
+        self.assertIn('NetCDFRestart', candidates[:2])
+        self.assertNotIn('PSFFile', candidates)
+        # Without a header, every format is a candidate
+        self.assertEqual(set(candidates_for(None)),
+                         set(registry.PARSER_REGISTRY))
+        # Formats that accept a header must agree with their file-based check
+        with open(get_fn('ala_ala_ala.psf'), 'rb') as f:
+            header = f.read(registry._HEADER_SIZE)
+        self.assertTrue(formats.PSFFile.id_format(get_fn('ala_ala_ala.psf'),
+                                                  header=header))
+        self.assertFalse(charmm.CharmmRstFile.id_format(
+                get_fn('ala_ala_ala.psf'), header=header))
+
+    def test_extension_dispatch(self):
+        """ Tests that the format matching a file extension is tried first """
+        registry = formats.registry
+        def first_candidate(filename):
+            return next(registry._id_candidates(filename, b''))[0]
+        self.assertEqual(first_candidate('4lzt.pdb'), 'PDBFile')
+        self.assertEqual(first_candidate('4LZT.CIF'), 'CIFFile')
+        self.assertEqual(first_candidate('trx.prmtop.gz'), 'AmberFormat')
+        self.assertEqual(first_candidate('tripos1.mol2.bz2'), 'Mol2File')
+        # A misleading extension falls back to the other formats
+        fn = get_fn('ala_ala_ala.pdb', written=True)
+        with open(get_fn('ala_ala_ala.psf'), 'r') as fr, open(fn, 'w') as fw:
+            fw.write(fr.read())
+        self.assertIsInstance(formats.load_file(fn), charmm.CharmmPsfFile)
+        # The extension candidate is not repeated
+        candidates = [e[0] for e in registry._id_candidates('x.psf', b'PSF')]
+        self.assertEqual(candidates.count('PSFFile'), 1)
+
+    def test_id_format_priority(self):
+        """ Tests that the id_format chain is ordered by priority """
+        chain = formats.registry._ID_FORMAT_CHAIN
+        self.assertEqual(len(chain), len(formats.registry.PARSER_REGISTRY))
+        priorities = [getattr(cls, 'priority', 100) for _, cls, _ in chain]
+        self.assertEqual(priorities, sorted(priorities))
+        self.assertEqual(set(entry[0] for entry in chain[:2]),
+                         {'PDBFile', 'AmberFormat'})
+
+    def test_format_cache(self):
+        """ Tests caching of identified file formats in load_file """
+        registry = formats.registry
+        fn = get_fn('test.mol2', written=True)
+        with open(get_fn('tripos1.mol2'), 'r') as fr, open(fn, 'w') as fw:
+            fw.write(fr.read())
+        self.assertIsInstance(formats.load_file(fn), ResidueTemplate)
+        self.assertIn('Mol2File', registry._FORMAT_CACHE.values())
+        self.assertIsInstance(formats.load_file(fn), ResidueTemplate)
+        # A different file at the same path is identified again
+        with open(get_fn('ala_ala_ala.psf'), 'r') as fr, open(fn, 'w') as fw:
+            fw.write(fr.read())
+        self.assertIsInstance(formats.load_file(fn), charmm.CharmmPsfFile)
+        self.assertLessEqual(len(registry._FORMAT_CACHE),
+                             registry._FORMAT_CACHE_SIZE)
+
+    def test_load_file_threads(self):
+        """ Tests calling load_file from several threads at once """
+        import threading
+        fnames = [get_fn('ala_ala_ala.psf'), get_fn('tripos1.mol2'),
+                  get_fn('trx.prmtop'), get_fn('4lzt.pdb.gz')] * 3
+        results = [None] * len(fnames)
+        def load(i):
+            results[i] = type(formats.load_file(fnames[i]))
+        threads = [threading.Thread(target=load, args=(i,))
+                   for i in range(len(fnames))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results[:4], [charmm.CharmmPsfFile, ResidueTemplate,
+                                       amber.AmberParm, Structure])
+        self.assertEqual(results, results[:4] * 3)
+
+    def test_id_format_header(self):
+        """ Tests that id_format gives the same answer with a header """
+        registry = formats.registry
+        fnames = ['small.parm7.gz', 'small.parm7.bz2', 'trx.prmtop',
+                  'ala3_solv.rst7', 'tz2.truncoct.crd', '1aki.ff99sbildn.gro',
+                  'amino12.lib', 'ala_ala_ala.psf', '4lzt.pdb.gz']
+        for fname in fnames:
+            fname = get_fn(fname)
+            header = registry._read_header(fname)
+            for name in registry._HEADER_PARSERS:
+                id_format = registry.PARSER_REGISTRY[name].id_format
+                self.assertEqual(id_format(fname, header=header),
+                                 id_format(fname))
+        header = registry._read_header(get_fn('small.parm7.gz'))
+        self.assertTrue(header.startswith(b'%VERSION'))
+        self.assertTrue(formats.registry.header_lines(header, 5))
+
+    def test_header_lines(self):
+        """ Tests decoding of the file header passed to id_format """
+        header_lines = formats.registry.header_lines
+        self.assertIs(header_lines(None), None)
+        self.assertIs(header_lines(b'truncated'), None)
+        self.assertIs(header_lines(b'line 1\r'), None)
+        self.assertEqual(header_lines(b'line 1\r\nline 2'), ['line 1\n'])
+        self.assertEqual(header_lines(b'line 1\rline 2\n', 2),
+                         ['line 1\n', 'line 2\n'])
+        self.assertIs(header_lines(b'line 1\nline 2', 2), None)
+
 class TestFileDownloader(unittest.TestCase):
     """ Tests load_file with URLs for each format """
 
@@ -2269,6 +2396,17 @@ class TestFileDownloader(unittest.TestCase):
         for key, item in iteritems(off):
             self.assertIsInstance(item, ResidueTemplate)
 
+    def test_load_file_url(self):
+        """ Tests load_file with remote files """
+        parm = formats.load_file(self.url + 'tip4p.parm7')
+        self.assertIsInstance(parm, amber.AmberParm)
+        self.assertEqual(parm.name, self.url + 'tip4p.parm7')
+        pdb = formats.load_file(self.url + '4lzt.pdb.gz')
+        self.assertIsInstance(pdb, Structure)
+        self.assertEqual(len(pdb.atoms), 1164)
+        self.assertRaises(IOError, lambda:
+                formats.load_file(self.url + 'no_such_file.pdb'))
+
     def test_download_amber_prmtop(self):
         """ Tests automatic loading of downloaded AmberParm object """
         self.assertTrue(amber.AmberFormat.id_format(self.url + 'tip4p.parm7'))